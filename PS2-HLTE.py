@@ -25,7 +25,10 @@
 # - PIL (Python Imaging Library) to generate and save images
 #--------------------------------------------------------------#
 
+from bisect import bisect_left
+import mmap
 import numpy as np
+import os
 from PIL import Image
 import re
 
@@ -35,116 +38,130 @@ def sanitize_filename(filename):
 
 def extract_palette(texture_data, num_colors=256):
     """Extract a palette from the texture data. Assuming 256-color palette."""
-    palette = []
-    for i in range(num_colors):
-        # Extract each color as 4 bytes (RGBA format)
-        start = i * 4
-        color = texture_data[start:start+4]
-        r, g, b, a = color
-        palette.append((r, g, b))  # Discard alpha, keep RGB only
-    return palette
-
-def extract_texture_indices(texture_data, palette, width, height):
+    # Each color is 4 bytes (RGBA format); view them as rows and keep RGB only
+    palette = np.frombuffer(texture_data, dtype=np.uint8, count=num_colors * 4).reshape(num_colors, 4)
+    return palette[:, :3].copy()  # Discard alpha, keep RGB only
+
+def extract_texture_indices(texture_data, palette, width, height, offset=0):
     """Extract indices of the palette for each pixel in the texture."""
-    indices = np.zeros((height, width), dtype=np.uint8)
-    
-    for y in range(height):
-        for x in range(width):
-            # Each pixel is 1 byte, so we get the palette index for each pixel
-            pixel_idx = texture_data[y * width + x]
-            indices[y, x] = pixel_idx
-    
-    return indices
+    # Each pixel is 1 byte, so the palette indices are just the raw bytes laid out row by row
+    return np.frombuffer(texture_data, dtype=np.uint8, count=width * height, offset=offset).reshape(height, width)
+
+# Texture names start with 'gman' (67 6D 61 6E) and end at 3 zeros (or 3 bytes before the end of the file)
+NAME_PATTERN = re.compile(rb'\x67\x6D\x61\x6E.*?(?=\x00\x00\x00|.{0,3}\Z)', re.DOTALL)
+
+# The other markers the parser looks for: 'psx_' and the texture data start 'FF FF FF 80'
+MARKER_PATTERN = re.compile(rb'\x70\x73\x78\x5F|\xFF\xFF\xFF\x80')
+
+def find_markers(data):
+    """Scan the data once and collect the offsets of every marker, grouped by marker bytes."""
+    markers = {b'\x70\x73\x78\x5F': [], b'\xFF\xFF\xFF\x80': []}
+    for match in MARKER_PATTERN.finditer(data):
+        markers[match.group()].append(match.start())
+    return markers
+
+def next_marker(offsets, start):
+    """Return the first marker offset at or after start, or -1 if there is none (like bytes.find)."""
+    i = bisect_left(offsets, start)
+    return offsets[i] if i < len(offsets) else -1
 
 def extract_textures(file_path):
     with open(file_path, "rb") as file:
-        data = file.read()
+        # An empty file has no textures (and cannot be mapped)
+        if os.fstat(file.fileno()).st_size == 0:
+            return
 
-    start = 0
-    texture_count = 0
+        # Map the file instead of reading it all in; the OS pages it in as it is searched
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
 
-    # Search for all names starting with 'psx_' (70 73 78 5F)
-    while start < len(data):
-        # Look for the texture name prefix 'psx_' (70 73 78 5F)
-        name_start = data.find(b'\x70\x73\x78\x5F', start)
-        if name_start != -1:
-            name_start = data.find(b'\x67\x6D\x61\x6E', start)
-        
-        if name_start == -1:
-            break  # No more texture names found
+    # The mapping is closed when extraction finishes or stops on an error; this only works
+    # if nothing built on top of it (views, arrays, images) is still alive at that point.
+    # Slices of the memoryview share the mapped file instead of copying bytes out of it
+    with data, memoryview(data) as view:
+        # Find all markers in a single pass instead of searching the file again for every texture
+        markers = find_markers(data)
+        name_prefixes = markers[b'\x70\x73\x78\x5F']
+        data_markers = markers[b'\xFF\xFF\xFF\x80']
 
-        print(f"Found texture name start at offset {name_start:#x}")
+        start = 0
+        texture_count = 0
 
-        # Now extract the texture name (null-terminated string after 'psx_')
-        name_end = name_start + 4
-        while name_end + 3 < len(data) and data[name_end:name_end + 3] != b'\x00\x00\x00':  # Null-terminated string with 3 zeros
-            name_end += 1
-        
-        texture_name = data[name_start:name_end].decode('ascii', errors='ignore')
+        # Walk all texture names in a single pass; each match runs from 'gman' to the name's terminator
+        for name_match in NAME_PATTERN.finditer(data):
+            # Only names with a texture name prefix 'psx_' (70 73 78 5F) still ahead are extracted
+            if next_marker(name_prefixes, start) == -1:
+                break  # No more texture names found
+
+            name_start, name_end = name_match.span()
+
+            print(f"Found texture name start at offset {name_start:#x}")
+
+            texture_name = name_match.group().decode('ascii', errors='ignore')
 
-        # Sanitize texture name to remove null characters or invalid characters
-        texture_name = sanitize_filename(texture_name)
+            # Sanitize texture name to remove null characters or invalid characters
+            texture_name = sanitize_filename(texture_name)
 
-        # Skip textures with names ending in '.BMP'
-        if texture_name.endswith('.BMP'):
-            print(f"Skipping texture {texture_name} (BMP file)")
-            start = name_end  # Move to the next texture
-            continue
+            # Skip textures with names ending in '.BMP'
+            if texture_name.endswith('.BMP'):
+                print(f"Skipping texture {texture_name} (BMP file)")
+                start = name_end  # Move to the next texture
+                continue
 
-        print(f"Texture name: {texture_name}")
+            print(f"Texture name: {texture_name}")
 
-        # Move to the next part of the file to search for the texture data (after the name)
-        start = name_end
+            # Move to the next part of the file to search for the texture data (after the name)
+            start = name_end
 
-        # Now search for the texture data associated with this name
-        # Look for texture data (starts with 'FF FF FF 80')
-        texture_start = data.find(b'\xFF\xFF\xFF\x80', start)
+            # Now search for the texture data associated with this name
+            # Look for texture data (starts with 'FF FF FF 80')
+            texture_start = next_marker(data_markers, start)
         
-        if texture_start == -1:
-            break  # No more textures found
+            if texture_start == -1:
+                break  # No more textures found
 
-        print(f"Found texture data at offset {texture_start:#x}")
+            print(f"Found texture data at offset {texture_start:#x}")
 
-        # Search for the next texture name prefix 'psx_' or the end of the file
-        next_texture_start = data.find(b'\x70\x73\x78\x5F', texture_start + 4)
+            # Search for the next texture name prefix 'psx_' or the end of the file
+            next_texture_start = next_marker(name_prefixes, texture_start + 4)
 
-        # If no other texture is found, end of file is the endpoint
-        texture_end = next_texture_start if next_texture_start != -1 else len(data)
+            # If no other texture is found, end of file is the endpoint
+            texture_end = next_texture_start if next_texture_start != -1 else len(data)
 
-        print(f"Texture end found at offset {texture_end:#x}")
+            print(f"Texture end found at offset {texture_end:#x}")
 
-        # Extract texture data from the texture start to the next texture start or the end of the file
-        texture_data = data[texture_start:texture_end]
+            # Extract texture data from the texture start to the next texture start or the end of the file
+            with view[texture_start:texture_end] as texture_data:
+                # Extract the 4-byte size pattern
+                size_pattern_start = texture_start - 4
+                if size_pattern_start >= 0:
+                    size_data = data[size_pattern_start:size_pattern_start + 4]  # Extract the 4-byte size pattern
+                    print(f"Detected raw size data: {size_data.hex()}")
 
-        # Extract the 4-byte size pattern
-        size_pattern_start = texture_start - 4
-        if size_pattern_start >= 0:
-            size_data = data[size_pattern_start:size_pattern_start + 4]  # Extract the 4-byte size pattern
-            print(f"Detected raw size data: {size_data.hex()}")
+                    # Decode the size data (assuming width and height are both 2-byte values in little-endian)
+                    width = int.from_bytes(size_data[:2], byteorder='little')
+                    height = int.from_bytes(size_data[2:], byteorder='little')
 
-            # Decode the size data (assuming width and height are both 2-byte values in little-endian)
-            width = int.from_bytes(size_data[:2], byteorder='little')
-            height = int.from_bytes(size_data[2:], byteorder='little')
+                    print(f"Decoded width: {width}, height: {height}")
 
-            print(f"Decoded width: {width}, height: {height}")
+                    # Handle palette and pixel data extraction
+                    num_colors = 256  # Assume 256 color palette
+                    palette = extract_palette(texture_data, num_colors=num_colors)
 
-            # Handle palette and pixel data extraction
-            num_colors = 256  # Assume 256 color palette
-            palette = extract_palette(texture_data, num_colors=num_colors)
+                    # Extract the indices of the palette for each pixel (they follow the palette). The image
+                    # shares the array's memory, so copy it out of the mapped file; otherwise a failing save
+                    # would keep it referenced from the traceback and the mapping could not be closed
+                    indices = extract_texture_indices(texture_data, palette, width, height, offset=num_colors * 4).copy()
 
-            # Extract the indices of the palette for each pixel
-            indices = extract_texture_indices(texture_data[num_colors * 4:], palette, width, height)
+                    # Convert the indices to an image (using "P" mode for indexed color images)
+                    image = Image.fromarray(indices, mode='P')
 
-            # Convert the indices to an image (using "P" mode for indexed color images)
-            image = Image.fromarray(indices, mode='P')
+                    # Set the palette in the image
+                    image.putpalette(palette.tobytes())
 
-            # Set the palette in the image
-            image.putpalette([component for color in palette for component in color])
+                    # Optionally save the image with the sanitized texture name (ensure it's saved as 8-bit indexed)
+                    image.save(f"{texture_name}.bmp")  # .bmp or .png will preserve 8-bit depth
 
-            # Optionally save the image with the sanitized texture name (ensure it's saved as 8-bit indexed)
-            image.save(f"{texture_name}.bmp")  # .bmp or .png will preserve 8-bit depth
-            
-            texture_count += 1
+                    texture_count += 1
 
 # Example usage:
 file_path = "gman.dol"  # Replace with your actual file path